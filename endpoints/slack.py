@@ -1,6 +1,8 @@
 import json
 import re
+import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 import requests
 from typing import Mapping, List, Tuple
 from werkzeug import Request, Response
@@ -9,6 +11,119 @@ from slack_sdk import WebClient
 from slack_sdk.errors import SlackApiError
 
 
+# Regexes used on every conversion, compiled once at import.
+_CODE_FENCE_RE = re.compile(r"^```(\w*)$", re.MULTILINE)
+_TRIPLE_EMPH_RE = re.compile(r"(?<!\*)\*\*\*([^*\n]+?)\*\*\*(?!\*)")
+# Any whitespace except the newline itself, so each line is stripped the
+# way rstrip() did — including unicode spaces such as U+3000.
+_TRAILING_WS_RE = re.compile(r"[^\S\n]+$", re.MULTILINE)
+_TRIPLE_PLACEHOLDER_RE = re.compile(
+    re.escape("%%BOLDITALIC_START%%") + r"(.*?)" + re.escape("%%BOLDITALIC_END%%")
+)
+_TABLE_PLACEHOLDER_RE = re.compile(r"%%TABLE_PLACEHOLDER_\d+%%")
+
+# Every inline/block pattern requires at least one of these literal
+# characters, so a line containing none of them can skip that regex pass
+# entirely. Checked with frozenset.isdisjoint, which scans the line once
+# in C — far cheaper than entering the regex engine.
+_INLINE_TRIGGER_CHARS = frozenset("*_~[")
+_BLOCK_TRIGGER_CHARS = frozenset("-#*_0123456789")
+
+# Mention tokens in Slack message text, e.g. "<@U04ABCDEF>".
+_MENTION_ANY_RE = re.compile(r"<@([^>]+)>")
+
+# One WebClient per bot token, so its HTTP connection state is reused
+# across requests instead of being rebuilt for every Slack event.
+_WEB_CLIENTS: dict = {}
+
+
+# users_info results rarely change, so cache them for an hour and spare
+# recurring thread participants a fresh API round-trip per request. The
+# cache is wiped wholesale if it ever grows past the cap.
+_USER_INFO_CACHE: dict = {}
+_USER_INFO_TTL = 3600.0
+_USER_INFO_CACHE_MAX = 10000
+
+
+def _get_user_info(client: WebClient, user_id: str):
+    """Return users_info for ``user_id``, cached for up to an hour."""
+    now = time.monotonic()
+    cached = _USER_INFO_CACHE.get(user_id)
+    if cached is not None and now - cached[0] < _USER_INFO_TTL:
+        return cached[1]
+    info = client.users_info(user=user_id)
+    if len(_USER_INFO_CACHE) >= _USER_INFO_CACHE_MAX:
+        _USER_INFO_CACHE.clear()
+    _USER_INFO_CACHE[user_id] = (now, info)
+    return info
+
+
+# Channel names for the allowlist check; they change rarely, so cache
+# them like user info and skip a conversations_info round-trip per
+# gated message.
+_CHANNEL_NAME_CACHE: dict = {}
+_CHANNEL_NAME_TTL = 3600.0
+
+
+def _get_channel_name(client: WebClient, channel: str) -> str:
+    """Return the channel's name, cached for up to an hour."""
+    now = time.monotonic()
+    cached = _CHANNEL_NAME_CACHE.get(channel)
+    if cached is not None and now - cached[0] < _CHANNEL_NAME_TTL:
+        return cached[1]
+    channel_info = client.conversations_info(channel=channel)
+    name = channel_info["channel"]["name"]
+    _CHANNEL_NAME_CACHE[channel] = (now, name)
+    return name
+
+
+def _get_web_client(token: str) -> WebClient:
+    """Return a cached WebClient for ``token``, creating it on first use."""
+    client = _WEB_CLIENTS.get(token)
+    if client is None:
+        # setdefault keeps a single instance if two requests race here
+        client = _WEB_CLIENTS.setdefault(token, WebClient(token=token))
+    return client
+
+
+def _iter_chunks(text: str, size: int):
+    """Yield successive slices of ``text`` of at most ``size`` characters."""
+    for i in range(0, len(text), size):
+        yield text[i : i + size]
+
+
+def _rewrite_mentions(text: str, user_display_name_map: dict) -> str:
+    """
+    Rewrite <@ID> mentions to @display name in one pass over ``text``.
+
+    Most messages contain few or no mentions, so a str.find scan is much
+    cheaper than running the regex engine per message.
+    """
+    if "<@" not in text:
+        return text
+    out = []
+    i = 0
+    while True:
+        j = text.find("<@", i)
+        if j < 0:
+            out.append(text[i:])
+            break
+        k = text.find(">", j + 2)
+        if k < 0:
+            out.append(text[i:])
+            break
+        out.append(text[i:j])
+        user_id = text[j + 2 : k]  # <@...>の...部分を取り出す
+        # user_display_name_mapに存在する場合のみ置換
+        if user_id in user_display_name_map:
+            out.append(f"@{user_display_name_map[user_id]}")
+        else:
+            # 不明なIDの場合はそのままにしておく
+            out.append(text[j : k + 1])
+        i = k + 1
+    return "".join(out)
+
+
 # ref: https://github.com/fla9ua/markdown_to_mrkdwn
 class SlackMarkdownConverter:
     """
@@ -27,10 +142,33 @@ class SlackMarkdownConverter:
             encoding (str): The character encoding to use for the conversion. Default is 'utf-8'.
         """
         self.encoding = encoding
-        self.in_code_block = False
-        self.table_replacements = {}
-        # Use compiled regex patterns for better performance
-        self.patterns: List[Tuple[re.Pattern, str]] = [
+        # Use compiled regex patterns for better performance.
+        #
+        # The three groups below are applied in order, and the split is
+        # load-bearing: image and italic must run before the block pass so
+        # italic inside headers converts before the header wraps its content
+        # in asterisks, and the block pass must run before the link pattern
+        # so task-list checkbox brackets are rewritten before the link
+        # regex can consume them. This mirrors the order the patterns were
+        # originally applied in sequentially.
+        self.early_inline_patterns: List[Tuple[re.Pattern, str]] = [
+            (re.compile(r"!\[.*?\]\((.+?)\)", re.MULTILINE), r"<\1>"),  # Images to URL
+            (
+                re.compile(r"(?<!\*)\*([^*\n]+?)\*(?!\*)", re.MULTILINE),
+                r"_\1_",
+            ),  # Italic
+        ]
+        self.late_inline_patterns: List[Tuple[re.Pattern, str]] = [
+            (
+                re.compile(r"(^|\s)~\*\*(.+?)\*\*(\s|$)", re.MULTILINE),
+                r"\1 *\2* \3",
+            ),  # Bold with space handling
+            (re.compile(r"(?<!\*)\*\*(.+?)\*\*(?!\*)", re.MULTILINE), r"*\1*"),  # Bold
+            (re.compile(r"__(.+?)__", re.MULTILINE), r"*\1*"),  # Underline as bold
+            (re.compile(r"\[(.+?)\]\((.+?)\)", re.MULTILINE), r"<\2|\1>"),  # Links
+            (re.compile(r"~~(.+?)~~", re.MULTILINE), r"~\1~"),  # Strikethrough
+        ]
+        self.block_patterns: List[Tuple[re.Pattern, str]] = [
             (
                 re.compile(r"^(\s*)- \[([ ])\] (.+)", re.MULTILINE),
                 r"\1• ☐ \3",
@@ -44,32 +182,26 @@ class SlackMarkdownConverter:
                 re.compile(r"^(\s*)(\d+)\. (.+)", re.MULTILINE),
                 r"\1\2. \3",
             ),  # Ordered list
-            (re.compile(r"!\[.*?\]\((.+?)\)", re.MULTILINE), r"<\1>"),  # Images to URL
-            (
-                re.compile(r"(?<!\*)\*([^*\n]+?)\*(?!\*)", re.MULTILINE),
-                r"_\1_",
-            ),  # Italic
-            (re.compile(r"^###### (.+)$", re.MULTILINE), r"*\1*"),  # H6 as bold
-            (re.compile(r"^##### (.+)$", re.MULTILINE), r"*\1*"),  # H5 as bold
-            (re.compile(r"^#### (.+)$", re.MULTILINE), r"*\1*"),  # H4 as bold
-            (re.compile(r"^### (.+)$", re.MULTILINE), r"*\1*"),  # H3 as bold
-            (re.compile(r"^## (.+)$", re.MULTILINE), r"*\1*"),  # H2 as bold
-            (re.compile(r"^# (.+)$", re.MULTILINE), r"*\1*"),  # H1 as bold
-            (
-                re.compile(r"(^|\s)~\*\*(.+?)\*\*(\s|$)", re.MULTILINE),
-                r"\1 *\2* \3",
-            ),  # Bold with space handling
-            (re.compile(r"(?<!\*)\*\*(.+?)\*\*(?!\*)", re.MULTILINE), r"*\1*"),  # Bold
-            (re.compile(r"__(.+?)__", re.MULTILINE), r"*\1*"),  # Underline as bold
-            (re.compile(r"\[(.+?)\]\((.+?)\)", re.MULTILINE), r"<\2|\1>"),  # Links
-            (re.compile(r"`(.+?)`", re.MULTILINE), r"`\1`"),  # Inline code
-            (re.compile(r"^> (.+)", re.MULTILINE), r"> \1"),  # Blockquote
+            (re.compile(r"^#{1,6} (.+)$", re.MULTILINE), r"*\1*"),  # H1-H6 as bold
             (
                 re.compile(r"^(---|\*\*\*|___)$", re.MULTILINE),
                 r"──────────",
             ),  # Horizontal line
-            (re.compile(r"~~(.+?)~~", re.MULTILINE), r"~\1~"),  # Strikethrough
         ]
+        self.patterns: List[Tuple[re.Pattern, str]] = (
+            self.early_inline_patterns
+            + self.block_patterns
+            + self.late_inline_patterns
+        )
+        # Only the block patterns are fused into one alternation: they are
+        # mutually exclusive line-prefix forms, so one scan with a dispatch
+        # callback is equivalent to applying them sequentially. The inline
+        # patterns stay sequential because their outputs feed each other
+        # (bold inside links, italic inside bold, ...) and re.sub never
+        # rescans replacement text, so an alternation would leave nested
+        # constructs unconverted.
+        self._replacers: dict = {}
+        self._block_re = self._fuse(self.block_patterns, "b")
         # Placeholders for triple emphasis
         self.triple_start = "%%BOLDITALIC_START%%"
         self.triple_end = "%%BOLDITALIC_END%%"
@@ -90,31 +222,43 @@ class SlackMarkdownConverter:
         try:
             markdown = markdown.strip()
 
-            self.table_replacements = {}
+            # Table state is local to this call, so a single converter
+            # instance can be shared between concurrent requests
+            table_replacements = {}
 
-            markdown = self._convert_tables(markdown)
+            markdown = self._convert_tables(markdown, table_replacements)
 
-            lines = markdown.split("\n")
-            converted_lines = [self._convert_line(line) for line in lines]
-            result = "\n".join(converted_lines)
-
-            for placeholder, table in self.table_replacements.items():
-                result = result.replace(placeholder, table)
+            if "```" not in markdown:
+                # Common case: no code fences at all, so skip the fence
+                # scan and convert the document as one prose segment
+                result = self._convert_prose(markdown)
+            else:
+                result = "".join(self._convert_segments(markdown))
+
+            if table_replacements:
+                # Restore all tables in one scan instead of one
+                # str.replace pass over the result per table
+                result = _TABLE_PLACEHOLDER_RE.sub(
+                    lambda m: table_replacements.get(m.group(0), m.group(0)),
+                    result,
+                )
 
-            return result.encode(self.encoding).decode(self.encoding)
+            return result
         except Exception as e:
             # Log the error for debugging
             return markdown
 
-    def _convert_tables(self, markdown: str) -> str:
+    def _convert_tables(self, markdown: str, table_replacements: dict) -> str:
         """
         Convert Markdown tables to Slack's mrkdwn format.
 
         Args:
             markdown (str): The Markdown text containing tables.
+            table_replacements (dict): Filled with placeholder → converted
+                table entries for this conversion.
 
         Returns:
-            str: The text with tables converted to Slack's format.
+            str: The text with tables replaced by numbered placeholders.
         """
         table_pattern = re.compile(
             r"^\|(.+)\|\s*$\n^\|[-:| ]+\|\s*$(\n^\|.+\|\s*$)*", re.MULTILINE
@@ -141,53 +285,111 @@ class SlackMarkdownConverter:
             for row in rows:
                 result.append(" | ".join(row))
 
-            placeholder = f"%%TABLE_PLACEHOLDER_{hash(original_table)}%%"
-            self.table_replacements[placeholder] = "\n".join(result)
+            # A running counter is collision-free and avoids hashing the
+            # whole table text
+            placeholder = f"%%TABLE_PLACEHOLDER_{len(table_replacements)}%%"
+            table_replacements[placeholder] = "\n".join(result)
             return placeholder
 
         return table_pattern.sub(convert_table, markdown)
 
-    def _convert_line(self, line: str) -> str:
+    def _fuse(self, patterns: List[Tuple[re.Pattern, str]], prefix: str) -> re.Pattern:
         """
-        Convert a single line of Markdown.
+        Combine a pattern list into one named-group alternation.
 
         Args:
-            line (str): A single line of Markdown text.
+            patterns (List[Tuple[re.Pattern, str]]): Patterns and replacements.
+            prefix (str): Prefix for the group names, unique per alternation.
 
         Returns:
-            str: The converted line in Slack's mrkdwn format.
+            re.Pattern: The compiled alternation; replacements are registered
+                in ``self._replacers`` under the group names.
         """
-        if line.startswith("%%TABLE_PLACEHOLDER_") and line.endswith("%%"):
-            return line
-
-        code_block_match = re.match(r"^```(\w*)$", line)
-        if code_block_match:
-            language = code_block_match.group(1)
-            self.in_code_block = not self.in_code_block
-            if self.in_code_block and language:
-                return f"```{language}"
-            return "```"
-
-        if self.in_code_block:
-            return line
-
-        line = re.sub(
-            r"(?<!\*)\*\*\*([^*\n]+?)\*\*\*(?!\*)",
-            lambda m: f"{self.triple_start}{m.group(1)}{self.triple_end}",
-            line,
+        for i, (pattern, replacement) in enumerate(patterns):
+            self._replacers[f"{prefix}{i}"] = (pattern, replacement)
+        return re.compile(
+            "|".join(
+                f"(?P<{prefix}{i}>{pattern.pattern})"
+                for i, (pattern, _) in enumerate(patterns)
+            ),
+            re.MULTILINE,
         )
 
-        for pattern, replacement in self.patterns:
-            line = pattern.sub(replacement, line)
+    def _replace_match(self, m: re.Match) -> str:
+        """
+        Apply the replacement of whichever alternative matched.
 
-        line = re.sub(
-            re.escape(self.triple_start) + r"(.*?)" + re.escape(self.triple_end),
-            r"*_\1_*",
-            line,
-            flags=re.MULTILINE,
-        )
+        Args:
+            m (re.Match): A match of the combined alternation pattern.
 
-        return line.rstrip()
+        Returns:
+            str: The matched span with that pattern's replacement applied.
+        """
+        pattern, replacement = self._replacers[m.lastgroup]
+        return pattern.sub(replacement, m.group(0))
+
+    def _convert_segments(self, markdown: str):
+        """
+        Split the text into alternating prose and code-fence segments.
+
+        Fence lines are located in a single scan; code segments pass through
+        verbatim while prose segments are converted as whole buffers, so no
+        Python-level per-line loop is needed.
+
+        Args:
+            markdown (str): The Markdown text to convert.
+
+        Yields:
+            str: Converted prose segments, fence lines and verbatim code
+                segments, in document order.
+        """
+        pos = 0
+        in_code_block = False
+        for fence in _CODE_FENCE_RE.finditer(markdown):
+            segment = markdown[pos : fence.start()]
+            yield segment if in_code_block else self._convert_prose(segment)
+            # Closing fences drop their language tag, as the line-based
+            # converter did; opening fences are kept as-is.
+            yield "```" if in_code_block else fence.group(0)
+            in_code_block = not in_code_block
+            pos = fence.end()
+        tail = markdown[pos:]
+        yield tail if in_code_block else self._convert_prose(tail)
+
+    def _convert_prose(self, segment: str) -> str:
+        """
+        Convert a prose segment of Markdown.
+
+        Args:
+            segment (str): A segment of Markdown text outside code fences.
+
+        Returns:
+            str: The converted segment in Slack's mrkdwn format.
+        """
+        has_inline = not _INLINE_TRIGGER_CHARS.isdisjoint(segment)
+        if has_inline:
+            segment = _TRIPLE_EMPH_RE.sub(
+                lambda m: f"{self.triple_start}{m.group(1)}{self.triple_end}",
+                segment,
+            )
+            for pattern, replacement in self.early_inline_patterns:
+                segment = pattern.sub(replacement, segment)
+
+        if not _BLOCK_TRIGGER_CHARS.isdisjoint(segment):
+            segment = self._block_re.sub(self._replace_match, segment)
+
+        if has_inline:
+            for pattern, replacement in self.late_inline_patterns:
+                segment = pattern.sub(replacement, segment)
+            segment = _TRIPLE_PLACEHOLDER_RE.sub(r"*_\1_*", segment)
+
+        return _TRAILING_WS_RE.sub("", segment)
+
+
+# Shared converter instance: compiling the pattern set is the expensive
+# part of construction, and convert() keeps no per-call state on the
+# instance, so one converter serves all requests.
+_CONVERTER = SlackMarkdownConverter()
 
 
 class SlackEndpoint(Endpoint):
@@ -248,14 +450,13 @@ class SlackEndpoint(Endpoint):
 
                 # Process the message and respond
                 token = settings.get("bot_token")
-                client = WebClient(token=token)
+                client = _get_web_client(token)
 
                 # allowed_channel が指定されているかチェック
                 if allowed_channel_setting and event.get("channel_type") != "im":
                     try:
                         # チャンネルIDからチャンネル名を取得
-                        channel_info = client.conversations_info(channel=channel)
-                        actual_channel_name = channel_info["channel"]["name"]
+                        actual_channel_name = _get_channel_name(client, channel)
                         # 取得したチャンネル名に "#" を付けて比較
                         current_channel_with_hash = f"#{actual_channel_name}"
                         if current_channel_with_hash != allowed_channel_setting:
@@ -312,7 +513,11 @@ class SlackEndpoint(Endpoint):
 
                     # Get thread history for better context
                     thread_history = []
-                    if thread_ts:
+                    # user list in the thread (set for O(1) dedup, list to
+                    # keep first-seen order)
+                    user_id_set = set()
+                    user_id_list = []
+                    if "thread_ts" in event:
                         # get thread history
                         try:
                             replies = client.conversations_replies(
@@ -320,10 +525,6 @@ class SlackEndpoint(Endpoint):
                             )
                             messages = replies.get("messages", [])
 
-                            # user list in the thread
-                            user_id_list = []
-                            # pattern to extract user id from slack message
-                            pattern = r"<@([^>]+)>"
                             # Format messages for context
                             for msg in messages:
                                 role = "assistant" if msg.get("bot_id") else "user"
@@ -336,75 +537,117 @@ class SlackEndpoint(Endpoint):
                                     }
                                 )
                                 user_id = msg.get("user", "unknown")
-                                if user_id != "unknown" and user_id not in user_id_list:
+                                if user_id != "unknown" and user_id not in user_id_set:
+                                    user_id_set.add(user_id)
                                     user_id_list.append(user_id)
                                 if content != "":
-                                    user_ids = re.findall(pattern, content)
+                                    user_ids = _MENTION_ANY_RE.findall(content)
                                     for user_id in user_ids:
-                                        if user_id not in user_id_list:
+                                        if user_id not in user_id_set:
+                                            user_id_set.add(user_id)
                                             user_id_list.append(user_id)
                         except SlackApiError as e:
                             print(f"Error getting thread history: {e}")
-
-                        # get user display name map from user id list
-                        user_display_name_map = {}
+                    else:
+                        # Top-level message: the thread would only contain
+                        # this event, so build the history locally and skip
+                        # the conversations_replies round-trip.
+                        content = event.get("text", "")
+                        thread_history.append(
+                            {
+                                "role": "user",
+                                "participant_id": sender_user_id or "unknown",
+                                "content": content,
+                            }
+                        )
+                        if sender_user_id:
+                            user_id_set.add(sender_user_id)
+                            user_id_list.append(sender_user_id)
+                        for user_id in _MENTION_ANY_RE.findall(content):
+                            if user_id not in user_id_set:
+                                user_id_set.add(user_id)
+                                user_id_list.append(user_id)
+
+                    # get user display name map from user id list
+                    # users_info is one blocking HTTPS round-trip per
+                    # user, so fetch them concurrently instead of serially
+                    def fetch_user_info(user_id):
                         try:
-                            for user_id in user_id_list:
-                                user_info = client.users_info(user=user_id)
-                                user_display_name = user_info.get("user", {}).get(
-                                    "name", ""
-                                )
-                                user_real_name = user_info.get("user", {}).get(
-                                    "real_name", ""
-                                )
-                                if user_display_name != "":
-                                    user_display_name_map[user_id] = (
-                                        user_real_name + " (" + user_display_name + ")"
-                                    )
-                                else:
-                                    user_display_name_map[user_id] = user_real_name
+                            return user_id, _get_user_info(client, user_id)
                         except SlackApiError as e:
                             print(f"Error getting user info: {e}")
-
-                        # add user display name to thread history
-                        pattern = r"<@([A-Za-z0-9]+)>"
-
-                        def replace_id_with_name(match):
-                            user_id = match.group(1)  # <@...>の...部分を取り出す
-                            # user_display_name_mapに存在する場合のみ置換
-                            if user_id in user_display_name_map:
-                                return f"@{user_display_name_map[user_id]}"
-                            else:
-                                # 不明なIDの場合はそのままにしておく
-                                return match.group(0)
-
-                        for msg in thread_history:
-                            msg["participant_name"] = user_display_name_map.get(
-                                msg.get("participant_id", "unknown"), "unknown"
+                            return user_id, None
+
+                    user_display_name_map = {}
+                    if user_id_list:
+                        with ThreadPoolExecutor(max_workers=8) as pool:
+                            results = list(pool.map(fetch_user_info, user_id_list))
+                        for user_id, user_info in results:
+                            if user_info is None:
+                                continue
+                            user_display_name = user_info.get("user", {}).get(
+                                "name", ""
                             )
-                            msg["content"] = re.sub(
-                                pattern, replace_id_with_name, msg["content"]
+                            user_real_name = user_info.get("user", {}).get(
+                                "real_name", ""
                             )
+                            if user_display_name != "":
+                                user_display_name_map[user_id] = (
+                                    user_real_name + " (" + user_display_name + ")"
+                                )
+                            else:
+                                user_display_name_map[user_id] = user_real_name
+
+                    # add user display name to thread history
+                    for msg in thread_history:
+                        msg["participant_name"] = user_display_name_map.get(
+                            msg.get("participant_id", "unknown"), "unknown"
+                        )
+                        msg["content"] = _rewrite_mentions(
+                            msg["content"], user_display_name_map
+                        )
 
                     uploaded_files = []
                     slack_files = event.get("files", [])
                     if slack_files:
-                        for f in slack_files:
+                        # Reuse one TLS connection to files.slack.com and
+                        # download independent files concurrently; uploads
+                        # still go through self.session serially below.
+                        download_session = requests.Session()
+                        download_session.headers["Authorization"] = f"Bearer {token}"
+
+                        def download_file(f):
                             file_name = f.get("name")
                             file_url = f.get("url_private_download")
                             file_mimetype = f.get(
                                 "mimetype", "application/octet-stream"
                             )
                             if not file_url or not file_name:
+                                return None
+                            # Stream the body into one growable buffer
+                            # instead of letting resp.content build and keep
+                            # a second full copy; the bytearray is passed
+                            # to the upload as-is.
+                            with download_session.get(file_url, stream=True) as resp:
+                                data = None
+                                if resp.status_code == 200:
+                                    data = bytearray()
+                                    for chunk in resp.iter_content(65536):
+                                        data += chunk
+                                return file_name, file_mimetype, resp.status_code, data
+
+                        with ThreadPoolExecutor(max_workers=8) as pool:
+                            downloads = list(pool.map(download_file, slack_files))
+
+                        for download in downloads:
+                            if download is None:
                                 continue
-
-                            headers = {"Authorization": f"Bearer {token}"}
-                            resp = requests.get(file_url, headers=headers)
-                            if resp.status_code == 200:
+                            file_name, file_mimetype, status_code, data = download
+                            if data is not None:
                                 try:
                                     storage_file = self.session.file.upload(
                                         filename=file_name,
-                                        content=resp.content,
+                                        content=data,
                                         mimetype=file_mimetype,
                                     )
                                     if storage_file:
@@ -427,16 +670,21 @@ class SlackEndpoint(Endpoint):
                                     )
                             else:
                                 print(
-                                    f"Failed to download file from Slack: {file_name}, status code={resp.status_code}"
+                                    f"Failed to download file from Slack: {file_name}, status code={status_code}"
                                 )
 
                     # Invoke the Dify app with the message
                     app_invoke_inputs = {
+                        # Compact form: the model is the only consumer, and
+                        # indentation just inflates the payload and its
+                        # token count
                         "thread_history": json.dumps(
-                            thread_history, indent=4, ensure_ascii=False
+                            thread_history, ensure_ascii=False, separators=(",", ":")
                         ),
                         "thread_users": json.dumps(
-                            user_display_name_map, indent=4, ensure_ascii=False
+                            user_display_name_map,
+                            ensure_ascii=False,
+                            separators=(",", ":"),
                         ),
                         "thread_ts": thread_ts,
                         "channel_id": channel,
@@ -455,7 +703,7 @@ class SlackEndpoint(Endpoint):
 
                     invoke_params = {
                         "app_id": settings["app"]["app_id"],
-                        "query": re.sub(pattern, replace_id_with_name, message),
+                        "query": _rewrite_mentions(message, user_display_name_map),
                         "inputs": app_invoke_inputs,
                         "response_mode": "blocking",
                     }
@@ -473,16 +721,11 @@ class SlackEndpoint(Endpoint):
                         )
 
                     try:
-                        converter = SlackMarkdownConverter()
-                        converted_answer = converter.convert(answer)
+                        converted_answer = _CONVERTER.convert(answer)
 
                         # Slackで指定されている3,000文字以上の場合は分割
                         # https://api.slack.com/reference/block-kit/composition-objects#text__fields
                         MAX_MSG_LEN = 3000
-                        chunks = [
-                            converted_answer[i : i + MAX_MSG_LEN]
-                            for i in range(0, len(converted_answer), MAX_MSG_LEN)
-                        ]
 
                         # ブロードキャストするかどうか
                         reply_broadcast = (
@@ -490,7 +733,9 @@ class SlackEndpoint(Endpoint):
                             and len(thread_history) == 1
                         )
 
-                        for i, chunk in enumerate(chunks):
+                        for i, chunk in enumerate(
+                            _iter_chunks(converted_answer, MAX_MSG_LEN)
+                        ):
                             # 分割したチャンクを blocks に載せる
                             answer_blocks = [
                                 {